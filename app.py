@@ -8,253 +8,661 @@ Web版本 - 支持团队协作
 import os
 import re
 import json
+import atexit
+import queue
 import sqlite3
 import hashlib
+import itertools
+import contextlib
+import collections
+import tempfile
+import threading
+import concurrent.futures
 from datetime import datetime
 from flask import Flask, request, render_template, jsonify, g
-from bs4 import BeautifulSoup
-from urllib.parse import unquote
+from selectolax.lexbor import LexborHTMLParser
+from urllib.parse import unquote, unquote_to_bytes
 
 app = Flask(__name__)
 DATABASE = 'rmuc2026_questions.db'
 
+_CONN = None
+_CONN_LOCK = threading.RLock()
+
+# 后台写盘线程池（保存上传的原始HTML），退出时等待写完
+_IO_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+atexit.register(_IO_POOL.shutdown, wait=True)
+
 
 # ==================== 数据库操作 ====================
 
 def get_db():
-    """获取数据库连接"""
-    db = getattr(g, '_database', None)
-    if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
+    """获取数据库连接
+
+    整个进程共用一个连接以保持 SQLite 页缓存，请求首次访问数据库时持有锁，直到请求结束释放。
+    因此同一进程内访问数据库的请求是串行的（读请求也一样，上传时剩余的解析也在锁内）；
+    WAL 的读写并发只在多个进程之间生效
+    """
+    global _CONN
+    if not getattr(g, '_db_locked', False):
+        _CONN_LOCK.acquire()
+        try:
+            if _CONN is None:
+                _CONN = connect_db()
+        except BaseException:
+            _CONN_LOCK.release()
+            raise
+        g._db_locked = True
+    return _CONN
+
+
+def connect_db():
+    """打开数据库连接并设置 PRAGMA"""
+    db = sqlite3.connect(DATABASE, check_same_thread=False, isolation_level=None)
+    try:
         db.row_factory = sqlite3.Row
+        # WAL + synchronous=NORMAL 避免每次提交都 fsync；journal_mode 会持久化，其余需每个连接单独设置
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute('PRAGMA temp_store=MEMORY')
+        db.execute('PRAGMA mmap_size=134217728')
+        db.execute('PRAGMA cache_size=-20000')
+        db.execute('PRAGMA busy_timeout=5000')
+        db.execute('PRAGMA foreign_keys=ON')
+    except BaseException:
+        db.close()
+        raise
     return db
 
 
 @app.teardown_appcontext
 def close_connection(exception):
-    """关闭数据库连接"""
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
+    """释放数据库连接，回滚请求中未提交的事务"""
+    if getattr(g, '_db_locked', False):
+        try:
+            if _CONN is not None and _CONN.in_transaction:
+                _CONN.rollback()
+        finally:
+            g._db_locked = False
+            _CONN_LOCK.release()
+
+
+@contextlib.contextmanager
+def write_transaction(db):
+    """写事务：BEGIN IMMEDIATE 一开始就拿到写锁，避免事务中途由读锁升级为写锁时"database is locked"；出错时回滚"""
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        yield db
+    except BaseException:
+        db.execute('ROLLBACK')
+        raise
+    db.execute('COMMIT')
 
 
 def init_db():
     """初始化数据库"""
     with app.app_context():
         db = get_db()
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS questions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                question TEXT NOT NULL,
-                question_hash TEXT NOT NULL UNIQUE,
-                option_a TEXT NOT NULL,
-                option_b TEXT NOT NULL,
-                option_c TEXT NOT NULL,
-                option_d TEXT NOT NULL,
-                correct_option TEXT,
-                count_a INTEGER DEFAULT 0,
-                count_b INTEGER DEFAULT 0,
-                count_c INTEGER DEFAULT 0,
-                count_d INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS upload_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                score REAL,
-                questions_added INTEGER DEFAULT 0,
-                questions_updated INTEGER DEFAULT 0,
-                uploader_info TEXT
-            )
-        ''')
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS upload_details (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                upload_log_id INTEGER NOT NULL,
-                question_id INTEGER NOT NULL,
-                action_type TEXT NOT NULL,
-                updated_option TEXT,
-                FOREIGN KEY (upload_log_id) REFERENCES upload_logs(id),
-                FOREIGN KEY (question_id) REFERENCES questions(id)
-            )
-        ''')
+        with write_transaction(db):
+            # 题目文本（很少变化）
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS questions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    question TEXT NOT NULL,
+                    question_hash TEXT NOT NULL UNIQUE,
+                    option_a TEXT NOT NULL,
+                    option_b TEXT NOT NULL,
+                    option_c TEXT NOT NULL,
+                    option_d TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # 每次上传都会更新的计数等字段单独成表，更新时不必重写整行题目文本
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS question_stats (
+                    question_id INTEGER PRIMARY KEY,
+                    count_a INTEGER NOT NULL DEFAULT 0,
+                    count_b INTEGER NOT NULL DEFAULT 0,
+                    count_c INTEGER NOT NULL DEFAULT 0,
+                    count_d INTEGER NOT NULL DEFAULT 0,
+                    correct_option TEXT,
+                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE
+                ) WITHOUT ROWID, STRICT
+            ''')
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS upload_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    score REAL,
+                    questions_added INTEGER DEFAULT 0,
+                    questions_updated INTEGER DEFAULT 0,
+                    uploader_info TEXT
+                )
+            ''')
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS upload_details (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    upload_log_id INTEGER NOT NULL,
+                    question_id INTEGER NOT NULL,
+                    action_type TEXT NOT NULL,
+                    updated_option TEXT,
+                    FOREIGN KEY (upload_log_id) REFERENCES upload_logs(id),
+                    FOREIGN KEY (question_id) REFERENCES questions(id)
+                )
+            ''')
+            # 回退上传按 upload_log_id 查明细；题目列表的最高分统计、删除题目时的外键检查按 question_id 查明细
+            db.execute('CREATE INDEX IF NOT EXISTS idx_upload_details_log ON upload_details(upload_log_id)')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_upload_details_q_opt ON upload_details(question_id, updated_option)')
+
+            # 轻量迁移：老数据库可能缺字段
+            columns = [row['name'] for row in db.execute('PRAGMA table_info(questions)').fetchall()]
+            if 'count_a' in columns:
+                # 老数据库的计数、正确选项、更新时间还在 questions 表中，迁移到 question_stats
+                correct_option_col = 'correct_option' if 'correct_option' in columns else 'NULL'
+                db.execute(f'''
+                    INSERT OR IGNORE INTO question_stats
+                    (question_id, count_a, count_b, count_c, count_d, correct_option, updated_at)
+                    SELECT id, COALESCE(count_a, 0), COALESCE(count_b, 0),
+                           COALESCE(count_c, 0), COALESCE(count_d, 0),
+                           {correct_option_col}, updated_at
+                    FROM questions
+                ''')
+                for col in ('correct_option', 'count_a', 'count_b', 'count_c', 'count_d', 'updated_at'):
+                    if col in columns:
+                        db.execute(f'ALTER TABLE questions DROP COLUMN {col}')
+
+            upload_log_columns = [row['name'] for row in db.execute('PRAGMA table_info(upload_logs)').fetchall()]
+            if 'score' not in upload_log_columns:
+                db.execute('ALTER TABLE upload_logs ADD COLUMN score REAL')
+
+            # 老版本删除题目时没有清理 upload_details，可能留下引用已删除题目的明细，开启外键约束前先清掉
+            db.execute('DELETE FROM upload_details WHERE question_id NOT IN (SELECT id FROM questions)')
 
-        # 轻量迁移：老数据库可能缺字段
-        columns = [row['name'] for row in db.execute('PRAGMA table_info(questions)').fetchall()]
-        if 'correct_option' not in columns:
-            db.execute('ALTER TABLE questions ADD COLUMN correct_option TEXT')
+            # 老数据库的 question_hash 为 SHA256（64位十六进制），按当前算法重新计算
+            legacy_rows = db.execute(
+                'SELECT id, question, option_a, option_b, option_c, option_d '
+                'FROM questions WHERE length(question_hash) = 64'
+            ).fetchall()
+            if legacy_rows:
+                db.executemany('UPDATE questions SET question_hash = ? WHERE id = ?', [
+                    (create_question_hash(row['question'], tuple(sorted({
+                        row['option_a'].encode('utf-8'), row['option_b'].encode('utf-8'),
+                        row['option_c'].encode('utf-8'), row['option_d'].encode('utf-8'),
+                    }))), row['id'])
+                    for row in legacy_rows
+                ])
 
-        upload_log_columns = [row['name'] for row in db.execute('PRAGMA table_info(upload_logs)').fetchall()]
-        if 'score' not in upload_log_columns:
-            db.execute('ALTER TABLE upload_logs ADD COLUMN score REAL')
-        db.commit()
+            # 题目和选项的全文索引（trigram 分词，支持中文子串匹配），由触发器与 questions 表保持同步
+            fts_exists = db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'questions_fts'"
+            ).fetchone()
+            db.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+                    question, option_a, option_b, option_c, option_d,
+                    content='questions', content_rowid='id', tokenize='trigram'
+                )
+            ''')
+            db.execute('''
+                CREATE TRIGGER IF NOT EXISTS questions_fts_ai AFTER INSERT ON questions BEGIN
+                    INSERT INTO questions_fts (rowid, question, option_a, option_b, option_c, option_d)
+                    VALUES (new.id, new.question, new.option_a, new.option_b, new.option_c, new.option_d);
+                END
+            ''')
+            db.execute('''
+                CREATE TRIGGER IF NOT EXISTS questions_fts_ad AFTER DELETE ON questions BEGIN
+                    INSERT INTO questions_fts (questions_fts, rowid, question, option_a, option_b, option_c, option_d)
+                    VALUES ('delete', old.id, old.question, old.option_a, old.option_b, old.option_c, old.option_d);
+                END
+            ''')
+            db.execute('''
+                CREATE TRIGGER IF NOT EXISTS questions_fts_au
+                AFTER UPDATE OF question, option_a, option_b, option_c, option_d ON questions BEGIN
+                    INSERT INTO questions_fts (questions_fts, rowid, question, option_a, option_b, option_c, option_d)
+                    VALUES ('delete', old.id, old.question, old.option_a, old.option_b, old.option_c, old.option_d);
+                    INSERT INTO questions_fts (rowid, question, option_a, option_b, option_c, option_d)
+                    VALUES (new.id, new.question, new.option_a, new.option_b, new.option_c, new.option_d);
+                END
+            ''')
+            if not fts_exists:
+                db.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
+
+            # 更新查询规划器的统计信息
+            db.execute('ANALYZE')
+
+
+_WS_RE = re.compile(r'\s+')
+_LEAD_NUM_RE = re.compile(r'^\d+[.、]\s*')
 
 
 def normalize_question(question_text):
     """标准化题目文本用于比较"""
-    text = re.sub(r'\s+', ' ', question_text)
-    text = re.sub(r'^\d+[.、]\s*', '', text)
-    return text.strip()
+    return _LEAD_NUM_RE.sub('', _WS_RE.sub(' ', question_text)).strip()
 
 
-def create_question_hash(question_text, options_set):
+def create_question_hash(question_text, sorted_options):
     """创建题目的唯一标识（基于题目文本和选项集合）
+
+    sorted_options 为 UTF-8 编码、已排序去重的选项，即 tuple(sorted(set(...)))
     
-    使用 SHA256 确保跨进程/跨重启一致性（Python内置hash()会随机化）
+    使用 BLAKE2b-160 确保跨进程/跨重启一致性（Python内置hash()会随机化），
+    只用于去重，比 SHA256 更快且索引更小
     选项排序后再拼接，确保选项顺序打乱的同一道题生成相同的hash
+    （逐段 update，不拼出中间字符串，结果等同于 "题目|选项1|选项2|..."）
+    UTF-8 字节序与码点顺序一致，按 bytes 排序与按文本排序结果相同
+    """
+    h = hashlib.blake2b(normalize_question(question_text).encode('utf-8'), digest_size=20)
+    for option in sorted_options:
+        h.update(b'|')
+        h.update(option)
+    return h.hexdigest()
+
+
+def decode_dit(dit_value):
+    """解码选项的 dit 属性（URL 编码的 UTF-8），返回 (选项文本, UTF-8 bytes)
+
+    dit 本身就是 UTF-8 字节，直接取出供 hash 使用，不必再对文本重新编码
     """
-    norm_q = normalize_question(question_text)
-    sorted_options = sorted(options_set)  # 排序确保顺序无关
-    combined = norm_q + '|' + '|'.join(sorted_options)
-    return hashlib.sha256(combined.encode('utf-8')).hexdigest()
+    raw = unquote_to_bytes(dit_value)
+    try:
+        return raw.decode('utf-8'), raw
+    except UnicodeDecodeError:
+        option_text = unquote(dit_value)
+        return option_text, option_text.encode('utf-8')
 
 
 def get_text_with_breaks(element):
     """获取元素文本，将<div>和<br>转换为换行"""
     text_parts = []
-    for child in element.children:
-        if child.name == 'div':
+    for child in element.iter(include_text=True):
+        if child.tag == 'div':
             text_parts.append('\n' + get_text_with_breaks(child))
-        elif child.name == 'br':
+        elif child.tag == 'br':
             text_parts.append('\n')
-        elif child.string:
-            text_parts.append(child.string)
-        elif hasattr(child, 'get_text'):
-            text_parts.append(child.get_text())
+        else:
+            text_parts.append(child.text() or '')
     return ''.join(text_parts).strip()
 
 
-def extract_questions_from_html(html_content):
-    """从HTML内容中提取题目信息"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    questions = []
+def iter_questions_from_html(html_content):
+    """从HTML内容中逐个提取题目信息"""
+    tree = LexborHTMLParser(html_content)
     
     # 使用CSS选择器正确匹配同时拥有多个class的元素
-    question_divs = soup.select('div.field.ui-field-contain[type="3"]')
+    question_divs = tree.css('div.field.ui-field-contain[type="3"]')
     
     for q_div in question_divs:
         try:
-            topic_html_div = q_div.find('div', class_='topichtml')
+            topic_html_div = q_div.css_first('div.topichtml')
             if topic_html_div:
                 question_text = get_text_with_breaks(topic_html_div)
             else:
                 continue
             
             options = []
+            encoded_options = []
             selected_option = None
-            option_divs = q_div.find_all('div', class_='ui-radio')
+            option_divs = q_div.css('div.ui-radio')
             
             for opt_div in option_divs:
-                label_div = opt_div.find('div', class_='label')
+                label_div = opt_div.css_first('div.label')
                 if label_div:
-                    dit_value = label_div.get('dit', '')
+                    dit_value = label_div.attributes.get('dit')
                     if dit_value:
-                        option_text = unquote(dit_value)
+                        option_text, encoded_option = decode_dit(dit_value)
                     else:
-                        option_text = label_div.get_text(strip=True)
+                        option_text = label_div.text(strip=True)
+                        encoded_option = option_text.encode('utf-8')
                     
                     options.append(option_text)
+                    encoded_options.append(encoded_option)
                     
-                    if 'checked' in opt_div.get('class', []):
+                    if 'checked' in (opt_div.attributes.get('class') or '').split():
                         selected_option = option_text
             
             # 只处理有4个选项的题目
             if question_text and len(options) == 4:
-                questions.append({
+                yield {
                     'question': question_text.strip(),
                     'options': options,
                     'selected_option': selected_option,
-                    'options_set': set(options)
-                })
+                    'sorted_options': tuple(sorted(set(encoded_options)))
+                }
                 
         except Exception as e:
             print(f"解析题目时出错: {e}")
             continue
-    
-    return questions
 
 
-def process_questions(questions, score=None):
-    """处理提取的题目，存入数据库"""
+# 题目容器的起始标签（各页面属性的引号、顺序不同，只认 class 中的 ui-field-contain）
+_QUESTION_START_RE = re.compile(r'<div\b[^<>]*\bui-field-contain\b', re.IGNORECASE)
+HTML_CHUNK_SIZE = 64 * 1024  # 流式读取HTML的块大小
+
+
+def iter_question_segments(chunks):
+    """把分块到达的HTML文本切成片段，每段以一个题目容器的起始标签开头
+
+    第一个题目之前的内容（<head> 等）直接丢弃，缓冲区中最多保留一道题的HTML
+    """
+    buffer = ''
+    found = False  # buffer 是否以题目容器的起始标签开头
+    scan = 0
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        for match in _QUESTION_START_RE.finditer(buffer, scan):
+            if found:
+                yield buffer[start:match.start()]
+            start = match.start()
+            found = True
+        if found:
+            buffer = buffer[start:]
+        else:
+            tail = buffer.rfind('<')
+            buffer = buffer[tail:] if tail >= 0 else ''
+        # 末尾可能是被切断的起始标签（标签内不含 '<'），下次从最后一个 '<' 开始重新匹配
+        scan = max(buffer.rfind('<'), 1 if found else 0)
+    if found:
+        yield buffer
+
+
+def iter_questions_from_file(path):
+    """从HTML文件中按块读取、按题目分段解析，内存占用与文件大小无关"""
+    with open(path, encoding='utf-8', errors='replace', newline='') as f:
+        chunks = iter(lambda: f.read(HTML_CHUNK_SIZE), '')
+        for segment in iter_question_segments(chunks):
+            yield from iter_questions_from_html(segment)
+
+
+QUESTION_BATCH_SIZE = 64  # 每批题目数
+QUESTION_QUEUE_SIZE = 4  # 解析线程最多领先的批数
+
+
+def iter_question_batches(questions):
+    """在后台线程中迭代题目（即解析HTML），按批产出题目列表
+
+    questions 为惰性的题目迭代器，如 iter_questions_from_html(...)。
+    解析与数据库写入交替进行；队列有界，内存中最多缓存 QUESTION_QUEUE_SIZE 批。
+    调用方提前结束（如写库出错）时通知解析线程退出
+    """
+    batches = queue.Queue(maxsize=QUESTION_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            batch = []
+            for q in questions:
+                batch.append(q)
+                if len(batch) == QUESTION_BATCH_SIZE:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch and not put(batch):
+                return
+            put(None)
+        except Exception as e:
+            put(e)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = batches.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+# 进程内已知的 question_hash 集合，首次上传时从数据库懒加载。
+# 集合中的 hash 才需要查库取回已有题目；不在集合中的通常是新题，但其他进程插入的题目不会出现在这里，
+# 因此新题用 ON CONFLICT DO NOTHING 插入，撞上已存在的题目时改走更新计数的流程
+_KNOWN_HASHES = None
+
+
+def get_known_hashes(db):
+    """获取进程内已知的 question_hash 集合"""
+    global _KNOWN_HASHES
+    if _KNOWN_HASHES is None:
+        _KNOWN_HASHES = {row[0] for row in db.execute('SELECT question_hash FROM questions')}
+    return _KNOWN_HASHES
+
+
+def option_letters(options):
+    """选项文本 -> 选项字母（a/b/c/d），选项文本重复时取第一个"""
+    letter_by_option = {}
+    for letter, option in zip('abcd', options):
+        letter_by_option.setdefault(option, letter)
+    return letter_by_option
+
+
+# 解析结果缓存：同一份HTML（按内容 hash）重复上传时跳过解析，最多保留 _PARSE_CACHE_SIZE 份
+_PARSE_CACHE = collections.OrderedDict()
+_PARSE_CACHE_SIZE = 32
+_PARSE_CACHE_LOCK = threading.Lock()
+
+
+def iter_cached_question_batches(key, questions):
+    """按批产出题目，命中缓存时直接复用上次的解析结果（缓存中的题目只读，不要修改）
+
+    key 为原始HTML（UTF-8 字节）的 blake2b 摘要；questions 为惰性的题目迭代器，只在未命中缓存时才会被迭代
+    """
+    with _PARSE_CACHE_LOCK:
+        batches = _PARSE_CACHE.get(key)
+        if batches is not None:
+            _PARSE_CACHE.move_to_end(key)
+    if batches is not None:
+        yield from batches
+        return
+
+    batches = []
+    for batch in iter_question_batches(questions):
+        batches.append(batch)
+        yield batch
+
+    # 完整解析完才放入缓存
+    with _PARSE_CACHE_LOCK:
+        _PARSE_CACHE[key] = batches
+        _PARSE_CACHE.move_to_end(key)
+        while len(_PARSE_CACHE) > _PARSE_CACHE_SIZE:
+            _PARSE_CACHE.popitem(last=False)
+
+
+# 按批查询题目用的 SQL：IN 列表固定为 QUESTION_BATCH_SIZE 个参数，
+# 不同批次的 SQL 文本相同，可以命中 sqlite3 的语句缓存
+_BATCH_PLACEHOLDERS = ','.join(['?'] * QUESTION_BATCH_SIZE)
+SELECT_QUESTIONS_BY_HASH_SQL = f'''
+    SELECT id, question_hash, option_a, option_b, option_c, option_d
+    FROM questions WHERE question_hash IN ({_BATCH_PLACEHOLDERS})
+'''
+
+
+def pad_batch_params(values):
+    """把一批 IN 参数用 NULL 补齐到 QUESTION_BATCH_SIZE 个（NULL 不会匹配任何行）"""
+    return [*values, *([None] * (QUESTION_BATCH_SIZE - len(values)))]
+
+
+def process_questions(question_batches, score=None):
+    """处理提取的题目，存入数据库
+
+    question_batches 为按批产出的题目列表（每批不超过 QUESTION_BATCH_SIZE 道）。
+    每批先用一次 IN 查询取回已存在的题目，在 Python 中分类后用 executemany 批量写入，
+    整个上传在同一个事务中完成。
+    先取到第一批题目再开始写事务，没有题目时不碰数据库；之后的批次边解析边写库，
+    剩余的解析时间会计入写锁（以及进程内连接锁，见 get_db）的持有时间。
+    返回 (提取题数, 新增题数, 更新题数)，没有提取到题目时不写入任何记录
+    """
+    question_batches = iter(question_batches)
+    first_batch = next(question_batches, None)
+    if first_batch is None:
+        return 0, 0, 0
+
     db = get_db()
+    extracted = 0
     added = 0
     updated = 0
-    details = []  # 记录修改详情: [(question_id, action_type, updated_option), ...]
-    
-    for q in questions:
-        question_hash = create_question_hash(q['question'], q['options_set'])
-        
-        # 查询是否已存在
-        existing = db.execute(
-            'SELECT * FROM questions WHERE question_hash = ?',
-            (question_hash,)
-        ).fetchone()
-        
-        if existing:
-            # 题目已存在，更新选中选项的计数
-            if q['selected_option']:
-                # 找到选中的选项对应的列
-                options_in_db = [existing['option_a'], existing['option_b'], 
-                                existing['option_c'], existing['option_d']]
-                
-                if q['selected_option'] in options_in_db:
-                    idx = options_in_db.index(q['selected_option'])
-                    option_letter = ['a', 'b', 'c', 'd'][idx]
-                    count_col = 'count_' + option_letter
-                    db.execute(f'''
-                        UPDATE questions 
-                        SET {count_col} = {count_col} + 1, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    ''', (existing['id'],))
-                    details.append((existing['id'], 'updated', option_letter))
-                    updated += 1
-        else:
-            # 新题目，插入数据库
-            options = q['options']
-            counts = [0, 0, 0, 0]
-            selected_option_letter = None
-            
-            # 如果有选中的选项，设置对应的计数为1
-            if q['selected_option'] and q['selected_option'] in options:
-                idx = options.index(q['selected_option'])
-                counts[idx] = 1
-                selected_option_letter = ['a', 'b', 'c', 'd'][idx]
-            
-            cursor = db.execute('''
-                INSERT INTO questions 
-                (question, question_hash, option_a, option_b, option_c, option_d,
-                 count_a, count_b, count_c, count_d)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (q['question'], question_hash, 
-                  options[0], options[1], options[2], options[3],
-                  counts[0], counts[1], counts[2], counts[3]))
-            new_question_id = cursor.lastrowid
-            details.append((new_question_id, 'added', selected_option_letter))
-            added += 1
-    
-    # 记录上传日志
-    cursor = db.execute('''
-        INSERT INTO upload_logs (score, questions_added, questions_updated)
-        VALUES (?, ?, ?)
-    ''', (score, added, updated))
-    upload_log_id = cursor.lastrowid
-    
-    # 记录详细修改信息
-    for question_id, action_type, updated_option in details:
-        db.execute('''
+    details = []  # 记录修改详情: [(question_hash, action_type, updated_option), ...]
+    known = {}  # question_hash -> {选项文本: 字母}，包括本次上传中新增的题目
+    id_by_hash = {}
+    stored_hashes = []  # 本次处理后确定已在数据库中的新 hash
+
+    with write_transaction(db):
+        known_hashes = get_known_hashes(db)
+        for questions in itertools.chain([first_batch], question_batches):
+            extracted += len(questions)
+            to_insert_stats = []  # [(question_hash, [count_a, count_b, count_c, count_d]), ...]
+            to_update = []  # [(question_hash, [inc_a, inc_b, inc_c, inc_d]), ...]
+
+            hashes = [create_question_hash(q['question'], q['sorted_options']) for q in questions]
+
+            # 进程内已知的 hash 先查库取回已有题目，全是新题时直接跳过查询
+            candidates = [h for h in hashes if h in known_hashes and h not in known]
+            if candidates:
+                for row in db.execute(SELECT_QUESTIONS_BY_HASH_SQL, pad_batch_params(candidates)):
+                    known[row['question_hash']] = option_letters(
+                        [row['option_a'], row['option_b'], row['option_c'], row['option_d']])
+                    id_by_hash[row['question_hash']] = row['id']
+
+            # 批内首次出现、且不在 known 中的题目先插入；其他进程已插入的题目会被跳过
+            new_questions = {}
+            for q, question_hash in zip(questions, hashes):
+                if question_hash not in known:
+                    new_questions.setdefault(question_hash, q)
+            fresh = set()  # 本次真正插入的 hash
+            if new_questions:
+                cursor = db.executemany('''
+                    INSERT INTO questions
+                    (question, question_hash, option_a, option_b, option_c, option_d)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(question_hash) DO NOTHING
+                ''', [(q['question'], question_hash, *q['options'])
+                      for question_hash, q in new_questions.items()])
+
+                # executemany 拿不到每行的 lastrowid，插入后再按 hash 取回 id。
+                # AUTOINCREMENT 的 id 单调递增，id 最大的 rowcount 行是本次插入的，其余是已存在的题目
+                rows = sorted(db.execute(SELECT_QUESTIONS_BY_HASH_SQL, pad_batch_params(list(new_questions))),
+                              key=lambda row: row['id'])
+                existing_count = len(rows) - cursor.rowcount
+                for n, row in enumerate(rows):
+                    id_by_hash[row['question_hash']] = row['id']
+                    if n < existing_count:
+                        known[row['question_hash']] = option_letters(
+                            [row['option_a'], row['option_b'], row['option_c'], row['option_d']])
+                    else:
+                        fresh.add(row['question_hash'])
+                stored_hashes.extend(new_questions)
+
+            for q, question_hash in zip(questions, hashes):
+                if question_hash in fresh:
+                    # 新题目（批内首次出现），按本次选中的选项初始化计数
+                    fresh.discard(question_hash)
+                    letter_by_option = option_letters(q['options'])
+
+                    # 如果有选中的选项，设置对应的计数为1
+                    selected_option_letter = letter_by_option.get(q['selected_option'])
+                    counts = [int(selected_option_letter == letter) for letter in 'abcd']
+
+                    to_insert_stats.append((question_hash, counts))
+                    known[question_hash] = letter_by_option
+                    details.append((question_hash, 'added', selected_option_letter))
+                    added += 1
+                else:
+                    # 题目已存在（或本次上传中已出现过），更新选中选项的计数
+                    option_letter = known[question_hash].get(q['selected_option'])
+                    if option_letter:
+                        to_update.append((question_hash, [int(option_letter == letter) for letter in 'abcd']))
+                        details.append((question_hash, 'updated', option_letter))
+                        updated += 1
+
+            db.executemany('''
+                INSERT INTO question_stats (question_id, count_a, count_b, count_c, count_d)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(id_by_hash[question_hash], *counts) for question_hash, counts in to_insert_stats])
+
+            db.executemany('''
+                UPDATE question_stats
+                SET count_a = count_a + ?, count_b = count_b + ?,
+                    count_c = count_c + ?, count_d = count_d + ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE question_id = ?
+            ''', [(*counts, id_by_hash[question_hash]) for question_hash, counts in to_update])
+
+        # 记录上传日志
+        cursor = db.execute('''
+            INSERT INTO upload_logs (score, questions_added, questions_updated)
+            VALUES (?, ?, ?)
+        ''', (score, added, updated))
+        upload_log_id = cursor.lastrowid
+
+        # 记录详细修改信息
+        db.executemany('''
             INSERT INTO upload_details (upload_log_id, question_id, action_type, updated_option)
             VALUES (?, ?, ?, ?)
-        ''', (upload_log_id, question_id, action_type, updated_option))
-    
-    db.commit()
-    return added, updated
+        ''', [(upload_log_id, id_by_hash[question_hash], action_type, updated_option)
+              for question_hash, action_type, updated_option in details])
+    known_hashes.update(stored_hashes)
+    return extracted, added, updated
+
+
+def spool_upload(stream, upload_dir):
+    """把请求体按块写入 uploads 目录下的临时文件，同时计算内容 hash
+
+    返回 (临时文件路径, blake2b 摘要, 字节数)；写入出错时删除临时文件
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    h = hashlib.blake2b()
+    size = 0
+    f = tempfile.NamedTemporaryFile('wb', dir=upload_dir, suffix='.tmp', delete=False)
+    try:
+        with f:
+            for block in iter(lambda: stream.read(HTML_CHUNK_SIZE), b''):
+                f.write(block)
+                h.update(block)
+                size += len(block)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+    return f.name, h.digest(), size
+
+
+def persist_html(html_content, upload_dir, filename):
+    """将原始HTML写入 uploads 目录（先写临时文件再替换，避免留下写了一半的文件）"""
+    tmp_path = None
+    try:
+        os.makedirs(upload_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile('wb', dir=upload_dir, suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            f.write(html_content.encode('utf-8'))
+        os.chmod(tmp_path, 0o644)  # NamedTemporaryFile 默认 0600
+        os.replace(tmp_path, os.path.join(upload_dir, filename))
+    except Exception as e:
+        # 写入或改名失败时删除临时文件，不在 uploads 目录留下 .tmp
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        print(f"保存上传HTML时出错: {e}")
 
 
 # ==================== API路由 ====================
 
+# 读取完整题目行（题目文本 + 计数等统计字段）
+QUESTION_SELECT = '''
+    SELECT q.*, s.correct_option, s.count_a, s.count_b, s.count_c, s.count_d, s.updated_at
+    FROM questions q
+    JOIN question_stats s ON s.question_id = q.id
+'''
+
+
 @app.route('/')
 def index():
     """主页"""
@@ -266,31 +674,36 @@ def get_stats():
     """获取统计信息"""
     db = get_db()
     
-    # 题目总数
-    total_questions = db.execute('SELECT COUNT(*) FROM questions').fetchone()[0]
-    
-    # 答题总次数
-    total_answers = db.execute(
-        'SELECT SUM(count_a + count_b + count_c + count_d) FROM questions'
-    ).fetchone()[0] or 0
-    
-    # 上传次数
-    total_uploads = db.execute('SELECT COUNT(*) FROM upload_logs').fetchone()[0]
+    # 题目总数、答题总次数、上传次数，一次查询取回
+    row = db.execute('''
+        SELECT (SELECT COUNT(*) FROM questions) AS total_questions,
+               (SELECT COALESCE(SUM(count_a + count_b + count_c + count_d), 0)
+                FROM question_stats) AS total_answers,
+               (SELECT COUNT(*) FROM upload_logs) AS total_uploads
+    ''').fetchone()
     
     return jsonify({
-        'total_questions': total_questions,
-        'total_answers': int(total_answers),
-        'total_uploads': total_uploads
+        'total_questions': row['total_questions'],
+        'total_answers': int(row['total_answers']),
+        'total_uploads': row['total_uploads']
     })
 
 
 @app.route('/api/upload', methods=['POST'])
 def upload_html():
-    """上传HTML并解析"""
+    """上传HTML并解析
+
+    JSON 请求体 {"html": ..., "score": ...}；或者直接以原始HTML作为请求体（得分放在 ?score= 中），
+    后者边接收边写入 uploads 目录的临时文件，再从文件按题目分段解析，内存占用与页面大小无关
+    """
     try:
-        data = request.get_json()
-        html_content = data.get('html', '')
-        score_raw = data.get('score', None)
+        if request.is_json:
+            data = request.get_json()
+            html_content = data.get('html', '')
+            score_raw = data.get('score', None)
+        else:
+            html_content = None
+            score_raw = request.args.get('score')
         score = None
         if score_raw is not None and str(score_raw).strip() != '':
             try:
@@ -298,30 +711,43 @@ def upload_html():
             except (TypeError, ValueError):
                 return jsonify({'success': False, 'error': '分数格式不正确'}), 400
         
-        if not html_content:
-            return jsonify({'success': False, 'error': '未提供HTML内容'})
-        
-        # 解析HTML
-        questions = extract_questions_from_html(html_content)
-        
-        if not questions:
-            return jsonify({'success': False, 'error': '未能从HTML中提取到任何题目（需要4个选项的单选题）'})
-        
-        # 处理并存储
-        added, updated = process_questions(questions, score=score)
-
-        # 解析成功后保存原始HTML到 uploads 目录，便于审计和调试
         upload_dir = os.path.join(app.root_path, 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
         filename = f'upload_{timestamp}.html'
-        file_path = os.path.join(upload_dir, filename)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        
+        if html_content is None:
+            # 原始HTML请求体：先落盘再从文件解析（后台线程解析，边解析边写库），解析成功后临时文件改名保存
+            tmp_path, key, size = spool_upload(request.stream, upload_dir)
+            try:
+                if not size:
+                    return jsonify({'success': False, 'error': '未提供HTML内容'})
+                extracted, added, updated = process_questions(
+                    iter_cached_question_batches(key, iter_questions_from_file(tmp_path)), score=score)
+                if extracted:
+                    os.chmod(tmp_path, 0o644)  # NamedTemporaryFile 默认 0600
+                    os.replace(tmp_path, os.path.join(upload_dir, filename))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+        else:
+            if not html_content:
+                return jsonify({'success': False, 'error': '未提供HTML内容'})
+            
+            # 解析HTML并存储（后台线程解析，边解析边写库）
+            key = hashlib.blake2b(html_content.encode('utf-8')).digest()
+            extracted, added, updated = process_questions(
+                iter_cached_question_batches(key, iter_questions_from_html(html_content)), score=score)
+            
+            # 解析成功后在后台保存原始HTML到 uploads 目录，便于审计和调试，不阻塞响应
+            if extracted:
+                _IO_POOL.submit(persist_html, html_content, upload_dir, filename)
+        
+        if not extracted:
+            return jsonify({'success': False, 'error': '未能从HTML中提取到任何题目（需要4个选项的单选题）'})
         
         return jsonify({
             'success': True,
-            'extracted': len(questions),
+            'extracted': extracted,
             'added': added,
             'updated': updated
         })
@@ -340,7 +766,21 @@ def get_questions():
     db = get_db()
     
     # 构建查询 - 支持搜索题目和所有选项
-    if search:
+    if search and len(search) >= 3:
+        # trigram 全文索引至少需要3个字符，按短语匹配即子串匹配
+        match_param = '"' + search.replace('"', '""') + '"'
+        total = db.execute(
+            'SELECT COUNT(*) FROM questions_fts WHERE questions_fts MATCH ?', (match_param,)
+        ).fetchone()[0]
+        questions = db.execute(
+            QUESTION_SELECT + '''
+            WHERE q.id IN (SELECT rowid FROM questions_fts WHERE questions_fts MATCH ?)
+            ORDER BY q.id DESC 
+            LIMIT ? OFFSET ?
+            ''',
+            (match_param, size, (page - 1) * size)
+        ).fetchall()
+    elif search:
         count_query = '''
             SELECT COUNT(*) FROM questions 
             WHERE question LIKE ? 
@@ -349,14 +789,13 @@ def get_questions():
                OR option_c LIKE ? 
                OR option_d LIKE ?
         '''
-        data_query = '''
-            SELECT * FROM questions 
-            WHERE question LIKE ? 
-               OR option_a LIKE ? 
-               OR option_b LIKE ? 
-               OR option_c LIKE ? 
-               OR option_d LIKE ?
-            ORDER BY id DESC 
+        data_query = QUESTION_SELECT + '''
+            WHERE q.question LIKE ? 
+               OR q.option_a LIKE ? 
+               OR q.option_b LIKE ? 
+               OR q.option_c LIKE ? 
+               OR q.option_d LIKE ?
+            ORDER BY q.id DESC 
             LIMIT ? OFFSET ?
         '''
         search_param = f'%{search}%'
@@ -366,7 +805,7 @@ def get_questions():
     else:
         total = db.execute('SELECT COUNT(*) FROM questions').fetchone()[0]
         questions = db.execute(
-            'SELECT * FROM questions ORDER BY id DESC LIMIT ? OFFSET ?',
+            QUESTION_SELECT + ' ORDER BY q.id DESC LIMIT ? OFFSET ?',
             (size, (page - 1) * size)
         ).fetchall()
     
@@ -374,34 +813,34 @@ def get_questions():
     
     question_dicts = [dict(q) for q in questions]
 
-    # 计算每题每选项的最高分（来自上传时填写的 score）
+    # 计算每题每选项的最高分（来自上传时填写的 score），一次查询按选项透视成四列
     question_ids = [q['id'] for q in question_dicts]
-    max_score_map = {}
+    max_score_by_id = {}
     if question_ids:
         placeholders = ','.join(['?'] * len(question_ids))
         rows = db.execute(
             f'''
             SELECT ud.question_id AS question_id,
-                   ud.updated_option AS opt,
-                   MAX(ul.score) AS max_score
+                   MAX(CASE WHEN ud.updated_option = 'a' THEN ul.score END) AS max_score_a,
+                   MAX(CASE WHEN ud.updated_option = 'b' THEN ul.score END) AS max_score_b,
+                   MAX(CASE WHEN ud.updated_option = 'c' THEN ul.score END) AS max_score_c,
+                   MAX(CASE WHEN ud.updated_option = 'd' THEN ul.score END) AS max_score_d
             FROM upload_details ud
             JOIN upload_logs ul ON ul.id = ud.upload_log_id
             WHERE ud.question_id IN ({placeholders})
               AND ud.updated_option IN ('a','b','c','d')
               AND ul.score IS NOT NULL
-            GROUP BY ud.question_id, ud.updated_option
+            GROUP BY ud.question_id
             ''',
             tuple(question_ids),
         ).fetchall()
         for r in rows:
-            max_score_map[(r['question_id'], r['opt'])] = r['max_score']
+            max_score_by_id[r['question_id']] = r
 
     for q in question_dicts:
-        qid = q['id']
-        q['max_score_a'] = max_score_map.get((qid, 'a'))
-        q['max_score_b'] = max_score_map.get((qid, 'b'))
-        q['max_score_c'] = max_score_map.get((qid, 'c'))
-        q['max_score_d'] = max_score_map.get((qid, 'd'))
+        r = max_score_by_id.get(q['id'])
+        for opt in ('a', 'b', 'c', 'd'):
+            q['max_score_' + opt] = r['max_score_' + opt] if r else None
 
     return jsonify({
         'questions': question_dicts,
@@ -426,13 +865,6 @@ def get_history():
 def update_upload_score(log_id):
     """更新上传记录的得分"""
     try:
-        db = get_db()
-        
-        # 检查记录是否存在
-        log = db.execute('SELECT * FROM upload_logs WHERE id = ?', (log_id,)).fetchone()
-        if not log:
-            return jsonify({'success': False, 'error': '记录不存在'})
-        
         data = request.get_json()
         score_raw = data.get('score', None)
         
@@ -445,8 +877,14 @@ def update_upload_score(log_id):
             except (TypeError, ValueError):
                 return jsonify({'success': False, 'error': '分数格式不正确'}), 400
         
-        db.execute('UPDATE upload_logs SET score = ? WHERE id = ?', (score, log_id))
-        db.commit()
+        db = get_db()
+        with write_transaction(db):
+            # 检查记录是否存在
+            log = db.execute('SELECT * FROM upload_logs WHERE id = ?', (log_id,)).fetchone()
+            if not log:
+                return jsonify({'success': False, 'error': '记录不存在'})
+            
+            db.execute('UPDATE upload_logs SET score = ? WHERE id = ?', (score, log_id))
         
         return jsonify({'success': True, 'score': score})
         
@@ -460,45 +898,57 @@ def delete_upload_log(log_id):
     try:
         db = get_db()
         
-        # 检查记录是否存在
-        log = db.execute('SELECT * FROM upload_logs WHERE id = ?', (log_id,)).fetchone()
-        if not log:
-            return jsonify({'success': False, 'error': '记录不存在'})
-        
-        # 获取该次上传的所有修改详情
-        details = db.execute(
-            'SELECT * FROM upload_details WHERE upload_log_id = ?', (log_id,)
-        ).fetchall()
-        
-        reverted_added = 0
-        reverted_updated = 0
-        
-        for detail in details:
-            question_id = detail['question_id']
-            action_type = detail['action_type']
-            updated_option = detail['updated_option']
+        with write_transaction(db):
+            # 检查记录是否存在
+            log = db.execute('SELECT * FROM upload_logs WHERE id = ?', (log_id,)).fetchone()
+            if not log:
+                return jsonify({'success': False, 'error': '记录不存在'})
             
-            if action_type == 'added':
-                # 删除新增的题目
-                db.execute('DELETE FROM questions WHERE id = ?', (question_id,))
-                reverted_added += 1
-            elif action_type == 'updated' and updated_option:
-                # 回退计数更新（减1）
-                count_col = 'count_' + updated_option
-                db.execute(f'''
-                    UPDATE questions 
-                    SET {count_col} = MAX(0, {count_col} - 1)
-                    WHERE id = ?
-                ''', (question_id,))
-                reverted_updated += 1
-        
-        # 删除修改详情记录
-        db.execute('DELETE FROM upload_details WHERE upload_log_id = ?', (log_id,))
-        
-        # 删除上传日志
-        db.execute('DELETE FROM upload_logs WHERE id = ?', (log_id,))
-        
-        db.commit()
+            # 该次上传对每题各选项的计数更新次数
+            decrements = db.execute('''
+                SELECT question_id,
+                       SUM(updated_option = 'a') AS dec_a,
+                       SUM(updated_option = 'b') AS dec_b,
+                       SUM(updated_option = 'c') AS dec_c,
+                       SUM(updated_option = 'd') AS dec_d,
+                       COUNT(*) AS total
+                FROM upload_details
+                WHERE upload_log_id = ? AND action_type = 'updated' AND updated_option IS NOT NULL
+                GROUP BY question_id
+            ''', (log_id,)).fetchall()
+            
+            reverted_updated = sum(row['total'] for row in decrements)
+            
+            # 回退计数更新（减去对应次数，不低于0）
+            db.executemany('''
+                UPDATE question_stats
+                SET count_a = MAX(0, count_a - ?), count_b = MAX(0, count_b - ?),
+                    count_c = MAX(0, count_c - ?), count_d = MAX(0, count_d - ?)
+                WHERE question_id = ?
+            ''', [(row['dec_a'], row['dec_b'], row['dec_c'], row['dec_d'], row['question_id'])
+                  for row in decrements])
+            
+            # 删除该次上传新增的题目，按依赖顺序：其他上传中引用这些题的明细 -> 题目 -> 本次明细。
+            # 新增题目由本次的 'added' 明细子查询得到，因此本次明细要最后删；
+            # 删除题目时这些明细仍引用着题目，外键检查推迟到提交时进行
+            db.execute('PRAGMA defer_foreign_keys = ON')
+            db.execute('''
+                DELETE FROM upload_details
+                WHERE upload_log_id != ? AND question_id IN (
+                    SELECT question_id FROM upload_details WHERE upload_log_id = ? AND action_type = 'added'
+                )
+            ''', (log_id, log_id))
+            reverted_added = db.execute('''
+                DELETE FROM questions WHERE id IN (
+                    SELECT question_id FROM upload_details WHERE upload_log_id = ? AND action_type = 'added'
+                )
+            ''', (log_id,)).rowcount
+            
+            # 删除修改详情记录
+            db.execute('DELETE FROM upload_details WHERE upload_log_id = ?', (log_id,))
+            
+            # 删除上传日志
+            db.execute('DELETE FROM upload_logs WHERE id = ?', (log_id,))
         
         return jsonify({
             'success': True,
@@ -515,14 +965,15 @@ def delete_question(question_id):
     try:
         db = get_db()
         
-        # 检查题目是否存在
-        question = db.execute('SELECT * FROM questions WHERE id = ?', (question_id,)).fetchone()
-        if not question:
-            return jsonify({'success': False, 'error': '题目不存在'})
-        
-        # 删除题目
-        db.execute('DELETE FROM questions WHERE id = ?', (question_id,))
-        db.commit()
+        with write_transaction(db):
+            # 检查题目是否存在
+            question = db.execute('SELECT * FROM questions WHERE id = ?', (question_id,)).fetchone()
+            if not question:
+                return jsonify({'success': False, 'error': '题目不存在'})
+            
+            # 删除题目（先清理引用该题的明细，满足外键约束）
+            db.execute('DELETE FROM upload_details WHERE question_id = ?', (question_id,))
+            db.execute('DELETE FROM questions WHERE id = ?', (question_id,))
         
         return jsonify({'success': True})
     except Exception as e:
@@ -539,15 +990,15 @@ def set_correct_option(question_id):
             return jsonify({'success': False, 'error': 'option 必须是 a/b/c/d'}), 400
 
         db = get_db()
-        question = db.execute('SELECT * FROM questions WHERE id = ?', (question_id,)).fetchone()
-        if not question:
-            return jsonify({'success': False, 'error': '题目不存在'}), 404
-
-        db.execute(
-            'UPDATE questions SET correct_option = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-            (option, question_id),
-        )
-        db.commit()
+        with write_transaction(db):
+            question = db.execute('SELECT * FROM questions WHERE id = ?', (question_id,)).fetchone()
+            if not question:
+                return jsonify({'success': False, 'error': '题目不存在'}), 404
+
+            db.execute(
+                'UPDATE question_stats SET correct_option = ?, updated_at = CURRENT_TIMESTAMP WHERE question_id = ?',
+                (option, question_id),
+            )
         return jsonify({'success': True, 'correct_option': option})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -557,7 +1008,7 @@ def set_correct_option(question_id):
 def export_data():
     """导出题库为JSON"""
     db = get_db()
-    questions = db.execute('SELECT * FROM questions ORDER BY id').fetchall()
+    questions = db.execute(QUESTION_SELECT + ' ORDER BY q.id').fetchall()
     
     return jsonify({
         'exported_at': datetime.now().isoformat(),
@@ -62,10 +62,11 @@ function uploadHtml() {
     btn.disabled = true;
     btn.textContent = '⏳ 处理中...';
 
-    fetch('/api/upload', {
+    // 直接以原始HTML作为请求体上传，服务端边接收边落盘、按题目分段解析
+    fetch('/api/upload?score=' + encodeURIComponent(scoreValue), {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ html: html, score: scoreValue })
+        headers: { 'Content-Type': 'text/html; charset=utf-8' },
+        body: html
     })
         .then(function (res) { return res.json(); })
         .then(function (data) {